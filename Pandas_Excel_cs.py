@@ -9,6 +9,11 @@
 # Syntax: pip install pandas openpyxl
 pip install pandas openpyxl
 
+# Install Faster Readers (optional):
+# Comment: Install calamine and pyxlsb for faster reading and .xlsb support.
+# Syntax: pip install python-calamine pyxlsb
+pip install python-calamine pyxlsb
+
 # ------------------------------
 # 2. Importing Libraries
 # ------------------------------
@@ -75,6 +80,22 @@ df.to_excel("output.xlsx", columns=["Column1", "Column2"], index=False)
 # Syntax: pd.read_excel(file_path, engine="openpyxl")
 df = pd.read_excel("file.xlsx", engine="openpyxl")
 
+# Read Excel File with Calamine:
+# Comment: Use the Rust-based calamine reader, much faster than openpyxl for .xlsx, .xls, .xlsb and .ods.
+# Syntax: pip install python-calamine; pd.read_excel(file_path, engine="calamine")
+df = pd.read_excel("file.xlsx", engine="calamine")
+
+# Read Binary Excel File:
+# Comment: Read a binary .xlsb workbook with pyxlsb when calamine is not installed.
+# Syntax: pip install pyxlsb; pd.read_excel(file_path, engine="pyxlsb")
+df = pd.read_excel("file.xlsb", engine="pyxlsb")
+
+# Pick the Fastest Installed Reader:
+# Comment: Let _excel_readers.py choose the backend per file type; run it directly to benchmark backends.
+# Syntax: from _excel_readers import read_excel; python _excel_readers.py sample.xlsx
+from _excel_readers import read_excel
+df = read_excel("file.xlsx")
+
 # ------------------------------
 # 7. Working with Excel Styles
 # ------------------------------
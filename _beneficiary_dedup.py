@@ -0,0 +1,173 @@
+# pip install pandas rapidfuzz
+
+import pandas as pd
+import numpy as np
+import os
+import time
+from rapidfuzz import process, fuzz
+from _excel_readers import read_excel
+from _df_column_mapper import build_fullname
+
+# Beneficiary list to deduplicate (.csv or an Excel workbook)
+input_file = 'beneficiaries.csv'
+
+# Candidate duplicate pairs, with their scores and duplicate group
+output_file = 'duplicate_pairs.csv'
+
+# Column holding the birth date, used to derive the birth_year blocking key
+birthdate_column = 'birthdate'
+
+# Column whose first letters and phonetic code become the name_prefix and name_key blocking keys
+block_name_column = 'last_name'
+
+# Number of leading letters kept by the name_prefix blocking key
+name_prefix_length = 3
+
+# Blocking passes: only records sharing every key of a pass are compared.
+# Several passes let a pair that differs in one key (a typo in the surname,
+# a wrong birth year) still be found by another pass.
+blocking_passes = [
+    ['barangay', 'birth_year'],
+    ['barangay', 'name_key'],
+]
+
+# Minimum score (0-100) for two records to be reported as a candidate duplicate
+score_cutoff = 90
+
+# Scorer applied to the full names; token_sort_ratio ignores the order of name parts
+scorer = fuzz.token_sort_ratio
+
+# Number of block rows scored per cdist call, bounding the score matrix of very large blocks
+query_chunk_size = 2000
+
+# Letter to digit code of the phonetic key (Soundex classes; vowels, h, w and y are dropped)
+phonetic_codes = str.maketrans({
+    **dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'), **dict.fromkeys('dt', '3'),
+    'l': '4', **dict.fromkeys('mn', '5'), 'r': '6', **dict.fromkeys('aeiouhwy', None),
+})
+
+# Function to compute a Soundex-style phonetic key for a whole column with string methods
+def phonetic_key(names):
+    letters = names.astype('string').str.lower().str.replace(r'[^a-z]', '', regex=True)
+    codes = letters.str[1:].str.translate(phonetic_codes)
+    # Runs of the same code count once (one pattern per digit; Arrow-backed strings have no backreferences)
+    for digit in '123456':
+        codes = codes.str.replace(f'{digit}+', digit, regex=True)
+    key = (letters.str[0].str.upper() + codes + '000').str[:4]
+    return key.where(letters.str.len() > 0)
+
+# Function to add the derived blocking key columns
+def add_blocking_keys(df, birthdate_column=birthdate_column, block_name_column=block_name_column):
+    if birthdate_column in df.columns:
+        df['birth_year'] = pd.to_datetime(df[birthdate_column], errors='coerce').dt.year.astype('Int64')
+    if block_name_column in df.columns:
+        names = df[block_name_column].astype('string').str.strip().str.lower()
+        df['name_prefix'] = names.str[:name_prefix_length]
+        df['name_key'] = phonetic_key(names)
+    return df
+
+# Function to list the row positions of every block with at least two records
+def iter_blocks(df, keys, mask=None):
+    # Records with a missing key get code -1 and are left out, rather than lumped into one huge block
+    codes = df.groupby(keys, dropna=True, sort=False, observed=True).ngroup().to_numpy()
+    if mask is not None:
+        codes = np.where(mask, codes, -1)
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+    for positions in np.split(order, bounds):
+        if len(positions) > 1 and codes[positions[0]] >= 0:
+            yield positions
+
+# Function to score every pair of records inside one block, in row chunks
+def score_block(names, positions, score_cutoff=score_cutoff, scorer=scorer):
+    block_names = names[positions]
+    # Starting worker threads costs more than scoring a small block on one core
+    workers = -1 if len(positions) > 200 else 1
+    lefts, rights, scores = [], [], []
+    for start in range(0, len(positions), query_chunk_size):
+        # Each chunk is compared only with itself and the rows after it, so every pair is scored once
+        chunk_scores = process.cdist(block_names[start:start + query_chunk_size], block_names[start:],
+                                     scorer=scorer, score_cutoff=score_cutoff, dtype=np.uint8, workers=workers)
+        i, j = np.nonzero(np.triu(chunk_scores, k=1))
+        lefts.append(positions[start + i])
+        rights.append(positions[start + j])
+        scores.append(chunk_scores[i, j])
+    return lefts, rights, scores
+
+# Function to find candidate duplicate pairs, comparing records only within their blocks
+def find_duplicate_pairs(df, blocking_passes=blocking_passes, score_cutoff=score_cutoff, scorer=scorer):
+    names = build_fullname(df).str.lower().to_numpy(dtype=object)
+    # Two blank names score 100 against each other, so records without a name are never compared
+    has_name = names != ''
+    pairs = []
+    comparisons = 0
+
+    for keys in blocking_passes:
+        missing = [key for key in keys if key not in df.columns]
+        if missing:
+            print(f'Skipping blocking pass {keys}: missing column(s) {missing}')
+            continue
+
+        lefts, rights, scores = [], [], []
+        for positions in iter_blocks(df, keys, has_name):
+            comparisons += len(positions) * (len(positions) - 1) // 2
+            left, right, score = score_block(names, positions, score_cutoff, scorer)
+            lefts += left
+            rights += right
+            scores += score
+        if lefts:
+            pairs.append(pd.DataFrame({'left': np.concatenate(lefts), 'right': np.concatenate(rights),
+                                       'score': np.concatenate(scores), 'pass': '+'.join(keys)}))
+
+    total = len(df) * (len(df) - 1) // 2
+    print(f'{comparisons:,} comparisons instead of {total:,} ({comparisons / total:.4%})' if total else 'Nothing to compare')
+
+    if not pairs:
+        return pd.DataFrame({'left': pd.Series(dtype='int64'), 'right': pd.Series(dtype='int64'),
+                             'score': pd.Series(dtype='uint8'), 'pass': pd.Series(dtype=object)})
+
+    # A pair found by several passes is kept once, with its best score (earlier pass on ties)
+    pairs = pd.concat(pairs, ignore_index=True)
+    return (pairs.sort_values('score', ascending=False, kind='stable')
+            .drop_duplicates(['left', 'right'])
+            .sort_values(['left', 'right'], ignore_index=True))
+
+# Function to group records linked by candidate pairs (union-find over the pair list)
+def duplicate_groups(pairs, n_records):
+    parent = np.arange(n_records)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for left, right in zip(pairs['left'], pairs['right']):
+        root_left, root_right = find(left), find(right)
+        if root_left != root_right:
+            parent[max(root_left, root_right)] = min(root_left, root_right)
+
+    # Each group is numbered by its first record
+    return np.array([find(i) for i in range(n_records)])
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    if os.path.splitext(input_file)[1].lower() == '.csv':
+        df = pd.read_csv(input_file)
+    else:
+        df = read_excel(input_file)
+    df = add_blocking_keys(df.reset_index(drop=True))
+
+    pairs = find_duplicate_pairs(df)
+    groups = duplicate_groups(pairs, len(df))
+
+    # Show each pair with both records' names and the group it belongs to
+    fullname = build_fullname(df)
+    pairs['left_name'] = fullname.to_numpy()[pairs['left']]
+    pairs['right_name'] = fullname.to_numpy()[pairs['right']]
+    pairs['duplicate_group'] = groups[pairs['left']]
+    pairs.to_csv(output_file, index=False)
+
+    print(f'{len(pairs)} candidate pair(s) in {pairs["duplicate_group"].nunique()} group(s) '
+          f'written to {output_file} in {time.perf_counter() - start:.1f}s')
@@ -1,7 +1,24 @@
-# pip install rapidfuzz
+# pip install rapidfuzz pyyaml
+# Directory mode: python _df_column_mapper.py <directory> [report.json]
 
 import pandas as pd
+import numpy as np
+import os
+import sys
+import json
+import re
+import hashlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from rapidfuzz import process, fuzz
+from _excel_readers import list_sheet_names
+from _excel_merger_to_df import build_file_inventory, read_excel_header
+
+# Mapping file of standard column names and their variations (.yaml/.yml or .json), e.g.
+#   birthdate: [birthdate, birth_date, dob, date_of_birth]
+#   household_id: [household_id, hh_id, hhid]
+# It is reloaded whenever its modification time changes; column_mapping below is used while it does not exist
+mapping_file = './column_mapping.yaml'
 
 # Define your standard column names and their variations
 column_mapping = {
@@ -10,40 +27,285 @@ column_mapping = {
     'last_name': ['last_name', 'lastname', 'lname', 'surname']
 }
 
-def get_closest_match(column, choices):
-    # Find the closest match from the choices list
-    best_match, score = process.extractOne(column, choices, scorer=fuzz.ratio)
-    return best_match
-
-def standardize_columns(df):
-    # Create a reverse mapping from variations to standard names
-    reverse_mapping = {var: std for std, vars in column_mapping.items() for var in vars}
-    standard_columns = list(reverse_mapping.keys())
-    
-    # Rename columns in the DataFrame using the reverse mapping with fuzzy matching
-    new_columns = {}
-    for col in df.columns:
-        closest_match = get_closest_match(col, standard_columns)
-        new_columns[col] = reverse_mapping.get(closest_match, col)
-    
+# Name columns joined into fullname, in order (columns missing from a DataFrame are skipped)
+name_parts = ['first_name', 'middle_name', 'last_name', 'suffix', 'extension_name']
+
+# Minimum fuzz.ratio score (0-100) for a header to be renamed to a standard name
+score_cutoff = 80
+
+# Matches scoring below this are flagged for review (exact variant matches score 100)
+review_score = 90
+
+# Persistent cache of resolved header layouts, keyed by the exact header tuple
+mapping_cache_file = './header_mapping_cache.json'
+
+# Per-file column renames written by the directory mode, for _excel_merger_to_df.py to apply while loading
+mapping_report_file = './header_mapping_report.json'
+
+# Number of worker processes reading header rows in directory mode (None = one per CPU core)
+max_workers = None
+
+# Function to normalize a header for exact lookup ('First Name ' and 'first-name' both become 'first_name')
+def normalize_header(header):
+    return re.sub(r'[\s\-]+', '_', str(header).strip().lower())
+
+# Function to load a column mapping from a YAML or JSON file
+def load_column_mapping(mapping_path):
+    with open(mapping_path, encoding='utf-8') as f:
+        if mapping_path.lower().endswith(('.yaml', '.yml')):
+            import yaml
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+# Function to check a loaded column mapping (a single variant may be written as a plain string)
+def check_column_mapping(column_mapping):
+    if not isinstance(column_mapping, dict):
+        raise ValueError('The column mapping must map standard names to lists of variants')
+    checked = {}
+    for std, vars in column_mapping.items():
+        if vars is None:
+            vars = []
+        elif isinstance(vars, str):
+            vars = [vars]
+        elif not isinstance(vars, list) or not all(isinstance(var, str) for var in vars):
+            raise ValueError(f'Variants of {std!r} must be a string or a list of strings, not {vars!r}')
+        checked[str(std)] = vars
+    return checked
+
+# Function to fingerprint a column mapping
+def mapping_hash(column_mapping):
+    return hashlib.sha1(json.dumps(column_mapping, sort_keys=True).encode('utf-8')).hexdigest()
+
+# Function to compile a column mapping into an exact-match hash index and a fuzzy fallback index
+def build_variant_index(column_mapping):
+    # Each standard name also matches itself
+    variants_by_std = {std: list(dict.fromkeys([std, *vars])) for std, vars in column_mapping.items()}
+    exact = {normalize_header(var): std for std, vars in variants_by_std.items() for var in vars}
+    variants = [normalize_header(var) for std, vars in variants_by_std.items() for var in vars]
+    standard_names = np.array([std for std, vars in variants_by_std.items() for var in vars], dtype=object)
+    return exact, variants, standard_names
+
+# Compiled column mapping that recompiles only when the mapping file changes on disk
+class MappingIndex:
+    def __init__(self, mapping_path=None, column_mapping=column_mapping):
+        self.mapping_path = mapping_path
+        self.default_mapping = column_mapping
+        self.mtime = None
+        self.compile(column_mapping)
+
+    def compile(self, column_mapping):
+        column_mapping = check_column_mapping(column_mapping)
+        self.exact, self.variants, self.standard_names = build_variant_index(column_mapping)
+        self.column_mapping = column_mapping
+        # Hashed once per compile, not on every lookup
+        self.version = mapping_hash(column_mapping)
+
+    # Called before every match: one stat() call, and a recompile only when the file's mtime has changed
+    def refresh(self):
+        if self.mapping_path is None:
+            return self
+        try:
+            mtime = os.stat(self.mapping_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self.mtime:
+            try:
+                self.compile(load_column_mapping(self.mapping_path) if mtime is not None else self.default_mapping)
+            except Exception as e:
+                # A half-written or invalid file must not stop matching; the next save is picked up again
+                print(f'Could not load {self.mapping_path}, keeping the previous mapping: {e}')
+            self.mtime = mtime
+        return self
+
+# Built once, instead of on every standardize_columns call
+mapping_index = MappingIndex(mapping_file, column_mapping)
+
+# Function to match headers to standard names: exact lookups first, then all remaining headers
+# scored against all variants at once
+def match_headers(headers, mapping_index=mapping_index, score_cutoff=score_cutoff):
+    mapping_index.refresh()
+    headers = [str(header) for header in headers]
+    matches = {}
+    unmatched = []
+    for header in headers:
+        std = mapping_index.exact.get(normalize_header(header))
+        if std is not None:
+            matches[header] = (std, 100.0)
+        else:
+            unmatched.append(header)
+    if not unmatched or not mapping_index.variants:
+        return matches
+
+    # One header x variant score matrix, computed on all cores; scores under the cutoff are 0
+    queries = [normalize_header(header) for header in unmatched]
+    scores = process.cdist(queries, mapping_index.variants, scorer=fuzz.ratio, score_cutoff=score_cutoff, workers=-1)
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(unmatched)), best]
+
+    matches.update({
+        header: (mapping_index.standard_names[b], round(float(score), 1))
+        for header, b, score in zip(unmatched, best, best_scores)
+        if score >= score_cutoff
+    })
+    return matches
+
+# Function to fingerprint the mapping settings, so a cache built with other settings is discarded
+def mapping_version(mapping_index, score_cutoff):
+    return f'{mapping_index.version}:{score_cutoff}'
+
+# Function to load the header mapping cache
+def load_mapping_cache(cache_path, version):
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+        if cache.get('version') == version:
+            return cache
+    return {'version': version, 'layouts': {}, 'headers': {}}
+
+# Function to save the header mapping cache
+def save_mapping_cache(cache_path, cache):
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, cache_path)
+
+# Function to resolve a header layout from the cache, fuzzy-matching only headers never seen before
+# (returns {header: {'standard': name or None, 'score': score, 'review': bool}})
+def resolve_headers(headers, cache, score_cutoff=score_cutoff, review_score=review_score):
+    headers = [str(header) for header in headers]
+
+    # A reloaded mapping file invalidates every cached match
+    version = mapping_version(mapping_index.refresh(), score_cutoff)
+    if cache['version'] != version:
+        cache.update({'version': version, 'layouts': {}, 'headers': {}})
+
+    # The exact header tuple is the key, so a known layout is a single dict lookup
+    signature = json.dumps(headers)
+    if signature in cache['layouts']:
+        return cache['layouts'][signature]
+
+    unseen = [header for header in dict.fromkeys(headers) if header not in cache['headers']]
+    matches = match_headers(unseen, mapping_index, score_cutoff)
+    for header in unseen:
+        standard, score = matches.get(header, (None, 0.0))
+        cache['headers'][header] = {'standard': standard, 'score': score,
+                                    'review': standard is not None and score < review_score}
+        if cache['headers'][header]['review']:
+            print(f"Low-confidence match '{header}' -> '{standard}' ({score}), please review")
+
+    layout = {header: cache['headers'][header] for header in headers}
+    cache['layouts'][signature] = layout
+    return layout
+
+# Function to list the cached matches flagged for review
+def headers_needing_review(cache):
+    rows = [(header, entry['standard'], entry['score'])
+            for header, entry in cache['headers'].items() if entry['review']]
+    return pd.DataFrame(rows, columns=['header', 'standard', 'score'])
+
+def standardize_columns(df, score_cutoff=score_cutoff, cache=None):
+    if cache is not None:
+        layout = resolve_headers(df.columns, cache, score_cutoff)
+        matches = {header: (entry['standard'], entry['score'])
+                   for header, entry in layout.items() if entry['standard'] is not None}
+    else:
+        # Rename columns in the DataFrame using the variant index with fuzzy matching
+        matches = match_headers(df.columns, mapping_index, score_cutoff)
+    new_columns = {col: matches[str(col)][0] for col in df.columns if str(col) in matches}
+
     df.rename(columns=new_columns, inplace=True)
-    
+
     return df
 
-# Sample DataFrame with varying column names
-data = {
-    'firstname': ['John', 'Jane'],
-    'middlename': ['A', 'B'],
-    'surnme': ['Doe', 'Smith']  # Typographical error
-}
-df = pd.DataFrame(data)
+# Function to standardize the columns of many DataFrames with a single batch of fuzzy matching
+def standardize_columns_batch(dfs, score_cutoff=score_cutoff):
+    # Each distinct header is scored once, however many files share it
+    unique_headers = list(dict.fromkeys(str(col) for df in dfs for col in df.columns))
+    matches = match_headers(unique_headers, mapping_index, score_cutoff)
+
+    for df in dfs:
+        df.rename(columns={col: matches[str(col)][0] for col in df.columns if str(col) in matches}, inplace=True)
+    return dfs
+
+# Function to read only the header row of every sheet of a workbook (runs in a worker process)
+def read_workbook_headers(file_path, engine=None):
+    try:
+        return {sheet_name: read_excel_header(file_path, sheet_name, engine)
+                for sheet_name in list_sheet_names(file_path, engine)}
+    except Exception as e:
+        print(f'Could not read headers of {file_path}: {e}')
+        return {}
+
+# Function to resolve the headers of every workbook in a directory without loading any data rows
+def build_mapping_report(directory, max_workers=None, score_cutoff=score_cutoff, engine=None):
+    file_paths = build_file_inventory(directory)
+
+    # Header rows are read in parallel; chunksize keeps per-task overhead low across thousands of files
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        chunksize = max(1, len(file_paths) // ((max_workers or os.cpu_count() or 1) * 4))
+        headers_by_file = dict(zip(file_paths, executor.map(partial(read_workbook_headers, engine=engine),
+                                                            file_paths, chunksize=chunksize)))
+
+    # Every distinct header in the directory is matched in one batch
+    unique_headers = list(dict.fromkeys(header for sheets in headers_by_file.values()
+                                        for headers in sheets.values() for header in headers))
+    matches = match_headers(unique_headers, mapping_index, score_cutoff)
+
+    # Only headers that change are recorded; files are keyed by absolute path
+    files = {
+        os.path.abspath(file_path): {
+            sheet_name: {header: matches[header][0] for header in headers
+                         if header in matches and matches[header][0] != header}
+            for sheet_name, headers in sheets.items()
+        }
+        for file_path, sheets in headers_by_file.items()
+    }
+    unmatched = sorted(header for header in unique_headers if header not in matches)
+    print(f'{len(unique_headers)} distinct header(s) in {len(file_paths)} workbook(s), {len(unmatched)} unmatched')
+    return {'files': files, 'unmatched': unmatched}
+
+# Function to save a mapping report
+def save_mapping_report(report_path, report):
+    tmp_path = report_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, report_path)
+
+# Function to build a fullname column by concatenating whole name columns at once, without a per-row apply
+def build_fullname(df, name_parts=name_parts):
+    parts = [col for col in name_parts if col in df.columns]
+    if not parts:
+        return pd.Series('', index=df.index, dtype='string')
+
+    # Missing and blank parts become empty strings, so they add no words to the name
+    columns = [df[col].astype('string').str.strip().fillna('') for col in parts]
+    fullname = columns[0].str.cat(columns[1:], sep=' ')
+
+    # Collapse the gaps left by empty parts and any repeated whitespace inside a part
+    return fullname.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Directory mode: write the per-file mapping report instead of running the sample
+        report = build_mapping_report(sys.argv[1], max_workers)
+        save_mapping_report(sys.argv[2] if len(sys.argv) > 2 else mapping_report_file, report)
+        sys.exit(0)
+
+    # Sample DataFrame with varying column names
+    data = {
+        'firstname': ['John', 'Jane'],
+        'middlename': ['A', 'B'],
+        'surnme': ['Doe', 'Smith']  # Typographical error
+    }
+    df = pd.DataFrame(data)
 
-# Standardize column names
-df = standardize_columns(df)
+    # Standardize column names, reusing the mappings resolved on earlier runs
+    cache = load_mapping_cache(mapping_cache_file, mapping_version(mapping_index.refresh(), score_cutoff))
+    df = standardize_columns(df, cache=cache)
+    save_mapping_cache(mapping_cache_file, cache)
+    print(headers_needing_review(cache))
 
-# Create the fullname column
-df['fullname'] = df[['first_name', 'middle_name', 'last_name']].apply(
-    lambda row: ' '.join(filter(None, [row['first_name'], row['middle_name'], row['last_name']])), axis=1
-)
+    # Create the fullname column
+    df['fullname'] = build_fullname(df)
 
-print(df)
+    print(df)
@@ -1,25 +1,439 @@
+# pip install pandas openpyxl xlsxwriter pyarrow
+
 import pandas as pd
 import os
+import re
+import json
+import shutil
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
-# Load the DataFrame from an Excel file
-df = pd.read_excel('./combined_data.xlsx', engine='openpyxl')
+# File holding the combined data (.xlsx, .csv or .parquet)
+input_file = './combined_data.xlsx'
 
 # Columns to split the DataFrame by
 columns_to_split_by = ['Municipality', 'Barangay']
 
-# Create a directory to save the output files
+# Directory to save the output files
 output_dir = './output_files'
-os.makedirs(output_dir, exist_ok=True)
 
-# Group the DataFrame by the specified columns
-grouped = df.groupby(columns_to_split_by)
+# Number of worker processes writing the Excel files
+# (None = one per CPU core, 1 = write the files one at a time)
+max_workers = None
+
+# Maximum number of groups handed to the workers but not yet written.
+# The main process never holds more than this many serialized groups at a time.
+max_in_flight = 16
+
+# Manifest of per-group content hashes; on re-runs only groups whose hash changed
+# are rewritten and files of vanished groups are deleted (None = rewrite everything)
+manifest_file = './output_files/manifest.json'
+
+# Directory of a Hive-partitioned Parquet dataset (Municipality=X/Barangay=Y/part-*.parquet).
+# When set, the data is written there in one pass instead of one Excel file per group.
+dataset_dir = None
+
+# Groups exported to Excel from the dataset, e.g. [('Municipality A', 'Barangay B')]
+export_groups = []
+
+# Single workbook holding one sheet per group.
+# When set, all groups are streamed into it instead of one file per group.
+workbook_file = None
+
+# Data rows per sheet; larger groups roll over into extra sheets
+# (Excel allows 1,048,576 rows including the header row)
+max_sheet_rows = 1048575
+
+# Output format of the streaming split mode ('csv', 'parquet' or 'xlsx').
+# When set, the input is read in chunks and never loaded whole.
+stream_format = None
+
+# Number of input rows read at a time by the streaming split mode
+stream_chunk_size = 50000
 
-# Iterate over each group and save to a separate Excel file
-for name, group in grouped:
-    # Generate a filename based on the group values
-    filename = '_'.join([str(val) for val in name]) + '.xlsx'
-    filepath = os.path.join(output_dir, filename)
-    # Save the group to an Excel file
+# Maximum number of output files kept open at once by the streaming split mode
+max_open_files = 256
+
+# Function to generate a filename based on the group values
+def group_filename(name, extension='.xlsx'):
+    return '_'.join([str(val) for val in name]) + extension
+
+# Function to save one group to an Excel file
+def write_group(group, filepath):
     group.to_excel(filepath, index=False, engine='openpyxl')
+    return filepath, len(group)
+
+# Function to compute a content hash for every group in one vectorized pass
+def group_hashes(df, columns_to_split_by):
+    # Rows with a missing key belong to no group (groupby drops them), so they are not hashed
+    df = df[df[columns_to_split_by].notna().all(axis=1)]
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+    # Weight each row hash by its (odd) position in the group so reordering rows
+    # changes the group hash; uint64 arithmetic simply wraps around on overflow
+    position = df.groupby(columns_to_split_by).cumcount().to_numpy(dtype=np.uint64)
+    weighted = pd.Series(row_hashes * (position * np.uint64(2) + np.uint64(1)), index=df.index)
+
+    sums = weighted.groupby([df[col] for col in columns_to_split_by]).sum()
+    # Keys are tuples even for a single split column, matching the names split_to_excel writes
+    return {group_filename(name if isinstance(name, tuple) else (name,)): format(int(value), '016x')
+            for name, value in sums.items()}
+
+# Function to load the manifest of a previous split
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {'columns': None, 'groups': {}}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+# Function to save the manifest of the current split
+def save_manifest(manifest_path, manifest):
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+# Function to split a DataFrame by columns and save each group to a separate Excel file
+def split_to_excel(df, columns_to_split_by, output_dir, max_workers=None, max_in_flight=16, manifest_path=None):
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Group the DataFrame by the specified columns
+    grouped = df.groupby(columns_to_split_by)
+
+    unchanged = set()
+    if manifest_path is not None:
+        hashes = group_hashes(df, columns_to_split_by)
+        columns = [f'{col}:{dtype}' for col, dtype in df.dtypes.items()]
+        previous = load_manifest(manifest_path)
+
+        # A changed column layout invalidates every group
+        if previous['columns'] == columns:
+            unchanged = {filename for filename, value in hashes.items()
+                         if previous['groups'].get(filename) == value
+                         and os.path.exists(os.path.join(output_dir, filename))}
+
+        removed = [filename for filename in previous['groups'] if filename not in hashes]
+        for filename in removed:
+            filepath = os.path.join(output_dir, filename)
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        print(f'{len(unchanged)} unchanged groups skipped, {len(removed)} vanished groups removed')
+
+    written = []
+    if max_workers == 1:
+        for name, group in grouped:
+            if group_filename(name) not in unchanged:
+                written.append(write_group(group, os.path.join(output_dir, group_filename(name))))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for name, group in grouped:
+                if group_filename(name) in unchanged:
+                    continue
+                # Wait for a worker to finish before handing out more groups,
+                # so in-flight memory stays bounded however many groups there are
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    written.extend(future.result() for future in done)
+                filepath = os.path.join(output_dir, group_filename(name))
+                pending.add(executor.submit(write_group, group, filepath))
+            written.extend(future.result() for future in wait(pending).done)
+
+    # Record the manifest only once every changed group has been written
+    if manifest_path is not None:
+        save_manifest(manifest_path, {'columns': columns, 'groups': hashes})
+
+    summary = pd.DataFrame(written, columns=['file', 'rows']).sort_values('file', ignore_index=True)
+    print(f"{len(summary)} files ({summary['rows'].sum()} rows) written to '{output_dir}'")
+    return summary
+
+# Function to write the DataFrame as a Hive-partitioned Parquet dataset in one pass
+def write_partitioned_dataset(df, columns_to_split_by, dataset_dir):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(
+        table, dataset_dir, format='parquet',
+        partitioning=columns_to_split_by, partitioning_flavor='hive',
+        basename_template='part-{i}.parquet',
+        # Partitions present in this run are replaced, others are left alone
+        existing_data_behavior='delete_matching',
+    )
+    print(f"Partitioned dataset written to '{dataset_dir}'")
+
+# Function to read a single group from the dataset, opening only its partition
+def read_partition(dataset_dir, columns_to_split_by, name):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    # Partition values are read back as text, as they appear in the folder names
+    partitioning = ds.partitioning(pa.schema([(col, pa.string()) for col in columns_to_split_by]), flavor='hive')
+    dataset = ds.dataset(dataset_dir, format='parquet', partitioning=partitioning)
+
+    condition = None
+    for col, val in zip(columns_to_split_by, name):
+        expression = ds.field(col) == str(val)
+        condition = expression if condition is None else condition & expression
+    group = dataset.to_table(filter=condition).to_pandas()
+
+    other_columns = [col for col in group.columns if col not in columns_to_split_by]
+    return group[list(columns_to_split_by) + other_columns]
+
+# Function to export selected groups from the dataset to Excel files
+def export_partitions_to_excel(dataset_dir, columns_to_split_by, groups, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+
+    written = []
+    for name in groups:
+        group = read_partition(dataset_dir, columns_to_split_by, name)
+        written.append(write_group(group, os.path.join(output_dir, group_filename(name))))
+
+    summary = pd.DataFrame(written, columns=['file', 'rows'])
+    print(f"{len(summary)} files ({summary['rows'].sum()} rows) exported to '{output_dir}'")
+    return summary
+
+# Function to build a unique, valid Excel sheet name for a group
+def sheet_title(name, used_titles):
+    # Excel sheet names are at most 31 characters and cannot contain []:*?/\
+    title = re.sub(r'[\[\]:*?/\\]', '_', '_'.join([str(val) for val in name]))[:31]
+    candidate = title
+    number = 2
+    while candidate.lower() in used_titles:
+        suffix = f' ({number})'
+        candidate = title[:31 - len(suffix)] + suffix
+        number += 1
+    used_titles.add(candidate.lower())
+    return candidate
+
+# Function to split a DataFrame by columns into one workbook with a sheet per group
+def split_to_workbook(df, columns_to_split_by, workbook_path, max_sheet_rows=1048575):
+    import xlsxwriter
+
+    # constant_memory flushes every row to disk as soon as the next one starts
+    workbook = xlsxwriter.Workbook(workbook_path, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+    header = [str(col) for col in df.columns]
+    used_titles = set()
+
+    written = []
+    for name, group in df.groupby(columns_to_split_by):
+        for start in range(0, len(group), max_sheet_rows):
+            part = group.iloc[start:start + max_sheet_rows]
+            worksheet = workbook.add_worksheet(sheet_title(name, used_titles))
+            worksheet.write_row(0, 0, header)
+            for row_number, row in enumerate(excel_rows(part), start=1):
+                worksheet.write_row(row_number, 0, row)
+            written.append((worksheet.name, len(part)))
+    workbook.close()
+
+    summary = pd.DataFrame(written, columns=['sheet', 'rows'])
+    print(f"{len(summary)} sheets ({summary['rows'].sum()} rows) written to '{workbook_path}'")
+    return summary
+
+# Function to read the input file as a sequence of DataFrame chunks
+def read_in_chunks(input_file, chunk_size=50000):
+    if input_file.endswith('.csv'):
+        yield from pd.read_csv(input_file, chunksize=chunk_size)
+    elif input_file.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(input_file).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        from _excel_readers import list_sheet_names
+        from _excel_merger_to_df import iter_excel_rows
+
+        sheet_name = list_sheet_names(input_file)[0]
+        for header, batch in iter_excel_rows(input_file, sheet_name, chunk_size):
+            yield pd.DataFrame(batch, columns=header)
+
+# Appends row batches of one group to a CSV file
+class CsvGroupWriter:
+    def __init__(self, path, first_open):
+        self.file = open(path, 'w' if first_open else 'a', newline='', encoding='utf-8')
+        self.write_header = first_open
+
+    def write(self, batch_df):
+        batch_df.to_csv(self.file, header=self.write_header, index=False)
+        self.write_header = False
+
+    def close(self):
+        self.file.close()
+
+# Appends row batches of one group to a Parquet part file; a Parquet file
+# cannot be reopened for appending, so each reopen starts a new part
+class ParquetGroupWriter:
+    def __init__(self, path, part_number, schema):
+        import pyarrow.parquet as pq
+
+        # The first part of a run replaces the parts an earlier run left in the group's folder
+        if part_number == 0 and os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path, exist_ok=True)
+        self.schema = schema
+        self.writer = pq.ParquetWriter(os.path.join(path, f'part-{part_number:05d}.parquet'), schema)
+
+    def write(self, batch_df):
+        from _excel_merger_to_df import batch_to_arrow
+
+        self.writer.write_table(batch_to_arrow(batch_df, self.schema))
+
+    def close(self):
+        self.writer.close()
+
+# Keeps at most max_open output writers open, closing the least recently used one
+class GroupWriterCache:
+    def __init__(self, output_dir, output_format, max_open=256):
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.max_open = max_open
+        self.writers = OrderedDict()
+        self.open_counts = {}
+        self.row_counts = {}
+        self.schema = None
+
+    def output_path(self, name):
+        # xlsx output is spooled to Parquet parts first (keeping text IDs and dates as they are)
+        # and converted once all rows are in
+        extensions = {'csv': '.csv', 'parquet': '', 'xlsx': '.xlsx.parts'}
+        return os.path.join(self.output_dir, group_filename(name, extensions[self.output_format]))
+
+    def get_writer(self, name, batch_df):
+        if name in self.writers:
+            self.writers.move_to_end(name)
+            return self.writers[name]
+
+        if len(self.writers) >= self.max_open:
+            _, oldest = self.writers.popitem(last=False)
+            oldest.close()
+
+        open_count = self.open_counts.get(name, 0)
+        if self.output_format == 'csv':
+            writer = CsvGroupWriter(self.output_path(name), first_open=(open_count == 0))
+        else:
+            if self.schema is None:
+                from _excel_merger_to_df import batch_schema
+
+                # New parts start from the schema of the first batch, widened as later batches require
+                self.schema = batch_schema(batch_df)
+            writer = ParquetGroupWriter(self.output_path(name), open_count, self.schema)
+
+        self.open_counts[name] = open_count + 1
+        self.writers[name] = writer
+        return writer
+
+    def write(self, name, batch_df):
+        writer = self.get_writer(name, batch_df)
+        if self.output_format == 'csv':
+            writer.write(batch_df)
+        else:
+            import pyarrow as pa
+            from _excel_merger_to_df import widen_schema
+
+            try:
+                writer.write(batch_df)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                # A column's values conflict with its type (text after numbers): store it as text
+                # from now on and continue this group in a new part with the wider schema
+                self.schema = widen_schema(self.schema, batch_df)
+                self.writers.pop(name).close()
+                self.get_writer(name, batch_df).write(batch_df)
+        self.row_counts[name] = self.row_counts.get(name, 0) + len(batch_df)
+
+    def close(self):
+        while self.writers:
+            _, writer = self.writers.popitem(last=False)
+            writer.close()
+
+    # Parts written before the schema was widened are cast to the final schema
+    def unify_parts(self):
+        if self.output_format == 'csv' or self.schema is None:
+            return
+        import pyarrow.parquet as pq
+        from _excel_merger_to_df import rewrite_parquet
+
+        for name in self.row_counts:
+            group_dir = self.output_path(name)
+            for part in sorted(os.listdir(group_dir)):
+                part_path = os.path.join(group_dir, part)
+                if not pq.read_schema(part_path).equals(self.schema, check_metadata=False):
+                    rewrite_parquet([part_path], part_path + '.tmp', self.schema)
+                    os.replace(part_path + '.tmp', part_path)
+
+# Function to yield DataFrame rows as tuples xlsxwriter can write (missing values as blanks)
+def excel_rows(df):
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+# Function to convert spooled Parquet parts to xlsx with constant memory use
+def parts_to_xlsx(parts_dir, xlsx_path, max_sheet_rows=1048575, chunk_size=50000):
+    import xlsxwriter
+    import pyarrow.parquet as pq
+
+    workbook = xlsxwriter.Workbook(xlsx_path, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+    worksheet = None
+    row_number = 0
+    for part in sorted(os.listdir(parts_dir)):
+        for batch in pq.ParquetFile(os.path.join(parts_dir, part)).iter_batches(batch_size=chunk_size):
+            chunk = batch.to_pandas()
+            for row in excel_rows(chunk):
+                # Groups larger than one sheet roll over into extra sheets, as in split_to_workbook
+                if worksheet is None or row_number > max_sheet_rows:
+                    worksheet = workbook.add_worksheet()
+                    worksheet.write_row(0, 0, [str(col) for col in chunk.columns])
+                    row_number = 1
+                worksheet.write_row(row_number, 0, row)
+                row_number += 1
+    workbook.close()
+    shutil.rmtree(parts_dir)
+
+# Function to split a file too large for memory in a single pass over its chunks
+def stream_split(input_file, columns_to_split_by, output_dir, output_format='csv', chunk_size=50000, max_open=256,
+                 max_sheet_rows=1048575):
+    if output_format not in ('csv', 'parquet', 'xlsx'):
+        raise ValueError("stream_format must be 'csv', 'parquet' or 'xlsx'")
+    os.makedirs(output_dir, exist_ok=True)
+
+    cache = GroupWriterCache(output_dir, output_format, max_open)
+    try:
+        for chunk in read_in_chunks(input_file, chunk_size):
+            # Append the rows of each group in the chunk to that group's output
+            for name, group in chunk.groupby(columns_to_split_by, sort=False):
+                cache.write(name, group)
+    finally:
+        cache.close()
+    cache.unify_parts()
+
+    written = []
+    for name, rows in cache.row_counts.items():
+        filepath = cache.output_path(name)
+        if output_format == 'xlsx':
+            xlsx_path = os.path.join(output_dir, group_filename(name))
+            parts_to_xlsx(filepath, xlsx_path, max_sheet_rows, chunk_size)
+            filepath = xlsx_path
+        written.append((filepath, rows))
+
+    summary = pd.DataFrame(written, columns=['file', 'rows']).sort_values('file', ignore_index=True)
+    print(f"{len(summary)} files ({summary['rows'].sum()} rows) written to '{output_dir}'")
+    return summary
+
+if __name__ == "__main__":
+    if stream_format:
+        summary = stream_split(input_file, columns_to_split_by, output_dir,
+                               stream_format, stream_chunk_size, max_open_files, max_sheet_rows)
+    elif workbook_file:
+        df = pd.read_excel(input_file, engine='openpyxl')
+
+        summary = split_to_workbook(df, columns_to_split_by, workbook_file, max_sheet_rows)
+    elif dataset_dir:
+        df = pd.read_excel(input_file, engine='openpyxl')
+
+        write_partitioned_dataset(df, columns_to_split_by, dataset_dir)
+        summary = export_partitions_to_excel(dataset_dir, columns_to_split_by, export_groups, output_dir)
+    else:
+        # Load the DataFrame from an Excel file
+        df = pd.read_excel(input_file, engine='openpyxl')
+
+        summary = split_to_excel(df, columns_to_split_by, output_dir, max_workers, max_in_flight, manifest_file)
 
-print(f"Data has been split and saved to '{output_dir}'")
+    print(f"Data has been split and saved to '{output_dir}'")
@@ -1,25 +1,529 @@
-# pip install pandas openpyxl
+# pip install pandas openpyxl python-calamine pyxlsb pyarrow
 
 import pandas as pd
 import os
+import json
+import hashlib
+import fnmatch
+import numpy as np
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import load_workbook
+from _excel_readers import read_excel, list_sheet_names
 
 # Directory containing Excel files
 directory = './'
 
-# List to hold DataFrames
-df_list = []
+# Look for workbooks in sub-folders as well
+recursive = True
 
-# Iterate over all files in the directory
-for filename in os.listdir(directory):
-    if filename.endswith('.xlsx') or filename.endswith('.xls'):
-        file_path = os.path.join(directory, filename)
-        # Read the Excel file into a DataFrame
-        df = pd.read_excel(file_path, engine='openpyxl')
-        # Append the DataFrame to the list
-        df_list.append(df)
+# Glob patterns a workbook must match (file name or path relative to directory)
+include_patterns = ['*.xlsx', '*.xlsm', '*.xlsb', '*.xls']
 
-# Concatenate all DataFrames in the list into a single DataFrame
-combined_df = pd.concat(df_list, ignore_index=True)
+# Glob patterns of workbooks to skip, e.g. Excel lock files or an archive folder
+exclude_patterns = ['~$*']
 
-# Display the combined DataFrame
-print(combined_df)
+# Sheets to read from every workbook (None = all sheets)
+sheet_names = None
+
+# Excel reader backend, e.g. 'calamine', 'pyxlsb' or 'openpyxl'
+# (None = fastest installed backend for each file type, see _excel_readers.py)
+reader_engine = None
+
+# Low-cardinality text columns stored as category in the merged DataFrame
+category_columns = ['Municipality', 'Barangay', 'source_file', 'source_sheet']
+
+# Number of worker processes used to parse the workbooks
+# (None = one per CPU core, 1 = read the files one at a time)
+max_workers = None
+
+# Directory holding the parsed-workbook cache (None = always re-parse every file)
+cache_dir = './.merge_cache'
+
+# Output file for the bounded-memory streaming mode ('.csv' or '.parquet').
+# When set, rows are appended to this file in batches instead of being
+# merged into a DataFrame, so peak memory does not grow with the input.
+stream_output = None
+
+# Number of rows held in memory at a time by the streaming mode
+stream_batch_size = 10000
+
+# Per-file column renames written by `python _df_column_mapper.py <directory>`,
+# applied to each sheet as it is loaded (None = keep the original headers)
+header_report_file = None
+
+# Function to check a relative path against a list of glob patterns
+def matches_any(rel_path, patterns):
+    name = os.path.basename(rel_path)
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern) for pattern in patterns)
+
+# Function to find the Excel files under a directory in a stable order
+def build_file_inventory(directory, include_patterns=('*.xlsx', '*.xlsm', '*.xlsb', '*.xls'), exclude_patterns=(), recursive=True):
+    file_paths = []
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        with os.scandir(current) as entries:
+            for entry in entries:
+                rel_path = os.path.relpath(entry.path, directory).replace(os.sep, '/')
+                if entry.is_dir(follow_symlinks=False):
+                    # Hidden folders (such as the merge cache) are never searched
+                    if recursive and not entry.name.startswith('.'):
+                        pending.append(entry.path)
+                elif matches_any(rel_path, include_patterns) and not matches_any(rel_path, exclude_patterns):
+                    file_paths.append(entry.path)
+    return sorted(file_paths)
+
+# Function to list the sheets to read from each workbook as (file, sheet) pairs
+def build_sheet_inventory(file_paths, sheet_names=None, engine=None):
+    sheet_inventory = []
+    for file_path in file_paths:
+        for sheet_name in list_sheet_names(file_path, engine):
+            if sheet_names is None or sheet_name in sheet_names:
+                sheet_inventory.append((file_path, sheet_name))
+    return sheet_inventory
+
+# Function to read a single sheet into a DataFrame tagged with its source
+def read_excel_sheet(file_sheet, engine=None):
+    file_path, sheet_name = file_sheet
+    df = read_excel(file_path, sheet_name=sheet_name, engine=engine)
+    df['source_file'] = file_path
+    df['source_sheet'] = sheet_name
+    return df
+
+# Function to read several sheets, in input order
+def read_excel_sheets(sheet_inventory, max_workers=None, engine=None):
+    if max_workers == 1 or len(sheet_inventory) <= 1:
+        return [read_excel_sheet(file_sheet, engine) for file_sheet in sheet_inventory]
+
+    # Parsing workbooks is CPU-bound, so spread the sheets over processes.
+    # executor.map returns results in input order, keeping the merge stable.
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(partial(read_excel_sheet, engine=engine), sheet_inventory))
+
+# Function to load the per-file column renames of a header mapping report
+def load_header_report(report_path):
+    with open(report_path) as f:
+        return json.load(f)['files']
+
+# Function to look up the column renames for one sheet
+def header_renames(header_report, file_sheet):
+    if not header_report:
+        return {}
+    file_path, sheet_name = file_sheet
+    return header_report.get(os.path.abspath(file_path), {}).get(str(sheet_name), {})
+
+# Function to compute the content hash of a file
+def file_content_hash(file_path, block_size=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+# Function to build the cache key of one sheet of a workbook
+def cache_key(file_sheet):
+    file_path, sheet_name = file_sheet
+    return f'{os.path.abspath(file_path)}::{sheet_name}'
+
+# Function to load the cache index (sheet key -> file fingerprint and cache file)
+def load_cache_index(cache_dir):
+    index_path = os.path.join(cache_dir, 'index.json')
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path) as f:
+        return json.load(f)
+
+# Function to save the cache index
+def save_cache_index(cache_dir, index):
+    index_path = os.path.join(cache_dir, 'index.json')
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)
+
+# Function to load a sheet from the cache, or return None if its workbook changed
+def load_cached_sheet(cache_dir, index, file_sheet):
+    file_path = file_sheet[0]
+    entry = index.get(cache_key(file_sheet))
+    if entry is None:
+        return None
+
+    cache_file = os.path.join(cache_dir, entry['cache_file'])
+    if not os.path.exists(cache_file):
+        return None
+
+    stat = os.stat(file_path)
+    if stat.st_size != entry['size']:
+        return None
+
+    # A touched but unchanged file only costs a hash, not a re-parse
+    if stat.st_mtime != entry['mtime']:
+        if file_content_hash(file_path) != entry['hash']:
+            return None
+        entry['mtime'] = stat.st_mtime
+
+    if cache_file.endswith('.pkl'):
+        return pd.read_pickle(cache_file)
+    return pd.read_parquet(cache_file)
+
+# Function to store a parsed sheet in the cache
+def store_cached_sheet(cache_dir, index, file_sheet, df):
+    import pyarrow as pa
+
+    file_path = file_sheet[0]
+    key = cache_key(file_sheet)
+    cache_name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    cache_file = cache_name + '.parquet'
+    try:
+        df.to_parquet(os.path.join(cache_dir, cache_file), index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # Columns mixing numbers and text (IDs next to "N/A") cannot be stored as Parquet;
+        # pickle keeps such sheets exactly as parsed, so they are still served from the cache
+        cache_file = cache_name + '.pkl'
+        df.to_pickle(os.path.join(cache_dir, cache_file))
+
+    # Drop the copy in the other format left by an earlier run
+    for stale_file in (cache_name + '.parquet', cache_name + '.pkl'):
+        if stale_file != cache_file and os.path.exists(os.path.join(cache_dir, stale_file)):
+            os.remove(os.path.join(cache_dir, stale_file))
+
+    stat = os.stat(file_path)
+    index[key] = {
+        'path': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'hash': file_content_hash(file_path),
+        'cache_file': cache_file,
+    }
+
+# Function to drop cache entries for workbooks that no longer exist
+def prune_cache(cache_dir, index):
+    for key in list(index):
+        if not os.path.exists(index[key]['path']):
+            entry = index.pop(key)
+            cache_file = os.path.join(cache_dir, entry['cache_file'])
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+
+# Function to pick the smallest nullable integer dtype holding a range of values
+def smallest_int_dtype(min_value, max_value):
+    for dtype in ['Int8', 'Int16', 'Int32']:
+        info = np.iinfo(dtype.lower())
+        if info.min <= min_value and max_value <= info.max:
+            return dtype
+    return 'Int64'
+
+# Function to compute one target dtype per column over all the DataFrames
+def reconcile_schema(df_list, category_columns=()):
+    columns = []
+    for df in df_list:
+        for col in df.columns:
+            if col not in columns:
+                columns.append(col)
+
+    schema = {}
+    for col in columns:
+        # Sheets where the column is missing or entirely blank say nothing about its type
+        pieces = [df[col] for df in df_list if col in df.columns and df[col].notna().any()]
+
+        if not pieces:
+            schema[col] = np.dtype(object)
+        elif col in category_columns:
+            categories = pd.unique(pd.concat([pd.Series(piece.dropna().unique()) for piece in pieces]))
+            try:
+                categories = sorted(categories)
+            except TypeError:
+                pass
+            schema[col] = pd.CategoricalDtype(categories)
+        elif all(pd.api.types.is_bool_dtype(piece) for piece in pieces):
+            schema[col] = 'boolean'
+        elif all(pd.api.types.is_numeric_dtype(piece) and not pd.api.types.is_bool_dtype(piece) for piece in pieces):
+            # Blank cells turn integer columns into float; restore them as nullable ints
+            values = [piece.dropna() for piece in pieces]
+            if all((v % 1 == 0).all() for v in values):
+                schema[col] = smallest_int_dtype(min(v.min() for v in values), max(v.max() for v in values))
+            else:
+                schema[col] = np.dtype('float64')
+        elif all(pd.api.types.is_datetime64_any_dtype(piece) for piece in pieces):
+            schema[col] = pieces[0].dtype if len({piece.dtype for piece in pieces}) == 1 else np.dtype('datetime64[ns]')
+        elif all(pd.api.types.is_string_dtype(piece) and not pd.api.types.is_object_dtype(piece) for piece in pieces):
+            # Text columns keep their compact string dtype rather than falling back to object
+            dtypes = {piece.dtype for piece in pieces}
+            schema[col] = dtypes.pop() if len(dtypes) == 1 else pd.StringDtype()
+        else:
+            schema[col] = np.dtype(object)
+    return schema
+
+# Function to concatenate DataFrames into preallocated columns of the reconciled dtypes
+def concat_with_schema(df_list, schema):
+    total_rows = sum(len(df) for df in df_list)
+    index = pd.RangeIndex(total_rows)
+
+    combined = {}
+    for col, dtype in schema.items():
+        # Allocate the full column once (all missing) and fill it sheet by sheet
+        column = pd.Series(index=index, dtype=dtype)
+        start = 0
+        for df in df_list:
+            end = start + len(df)
+            if col in df.columns and end > start:
+                column.array[start:end] = df[col].astype(dtype).array
+            start = end
+        combined[col] = column
+    return pd.DataFrame(combined, index=index)
+
+# Function to read every sheet in the inventory and merge them into one DataFrame
+def merge_excel_files(sheet_inventory, max_workers=None, cache_dir=None, category_columns=(), engine=None, header_report=None):
+    if not sheet_inventory:
+        print("No Excel sheets found to merge.")
+        return None
+
+    if cache_dir is None:
+        df_list = read_excel_sheets(sheet_inventory, max_workers, engine)
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        index = load_cache_index(cache_dir)
+
+        # Load sheets of unchanged workbooks from the cache and collect the rest
+        df_by_sheet = {}
+        for file_sheet in sheet_inventory:
+            df = load_cached_sheet(cache_dir, index, file_sheet)
+            if df is not None:
+                df_by_sheet[file_sheet] = df
+
+        changed_sheets = [fs for fs in sheet_inventory if fs not in df_by_sheet]
+        print(f'{len(df_by_sheet)} sheet(s) loaded from cache, {len(changed_sheets)} to parse')
+
+        # Only sheets of new or changed workbooks are parsed again
+        for file_sheet, df in zip(changed_sheets, read_excel_sheets(changed_sheets, max_workers, engine)):
+            store_cached_sheet(cache_dir, index, file_sheet, df)
+            df_by_sheet[file_sheet] = df
+
+        prune_cache(cache_dir, index)
+        save_cache_index(cache_dir, index)
+
+        df_list = [df_by_sheet[file_sheet] for file_sheet in sheet_inventory]
+
+    # Renames are applied after the cache, so a new report never needs a re-parse
+    if header_report:
+        df_list = [df.rename(columns=header_renames(header_report, file_sheet))
+                   for df, file_sheet in zip(df_list, sheet_inventory)]
+
+    # Concatenate all DataFrames in the list into a single DataFrame,
+    # aligning their columns on one compact schema instead of upcasting to object
+    schema = reconcile_schema(df_list, category_columns)
+    return concat_with_schema(df_list, schema)
+
+# Function to check whether openpyxl can iterate a workbook's rows lazily
+def supports_row_streaming(file_path):
+    return file_path.lower().endswith(('.xlsx', '.xlsm'))
+
+# Function to yield the header and row batches of one sheet of a workbook
+def iter_excel_rows(file_path, sheet_name, batch_size=10000, engine=None):
+    if not supports_row_streaming(file_path):
+        # Other formats are read one sheet at a time with the regular reader
+        df = read_excel(file_path, sheet_name=sheet_name, engine=engine)
+        header = [str(col) for col in df.columns]
+        for start in range(0, len(df), batch_size):
+            yield header, list(df.iloc[start:start + batch_size].itertuples(index=False, name=None))
+        return
+
+    # read_only mode parses the sheet lazily instead of loading it whole
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(col) if col is not None else f'Unnamed: {i}' for i, col in enumerate(header)]
+
+        batch = []
+        for row in rows:
+            batch.append(row[:len(header)])
+            if len(batch) >= batch_size:
+                yield header, batch
+                batch = []
+        if batch:
+            yield header, batch
+    finally:
+        workbook.close()
+
+# Function to read only the header row of one sheet of a workbook
+def read_excel_header(file_path, sheet_name, engine=None):
+    if not supports_row_streaming(file_path):
+        df = read_excel(file_path, sheet_name=sheet_name, engine=engine, nrows=0)
+        return [str(col) for col in df.columns]
+
+    # The first row is read directly: a header-only sheet yields no data batches to take it from
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        header = next(workbook[sheet_name].iter_rows(max_row=1, values_only=True), None)
+    finally:
+        workbook.close()
+    if header is None:
+        return []
+    return [str(col) if col is not None else f'Unnamed: {i}' for i, col in enumerate(header)]
+
+# Function to write one batch of rows to a CSV file
+def append_batch_to_csv(batch_df, output_path, write_header):
+    batch_df.to_csv(output_path, mode='w' if write_header else 'a', header=write_header, index=False)
+
+# Function to build a Parquet schema that later batches can be cast to
+def batch_schema(batch_df):
+    import pyarrow as pa
+
+    fields = []
+    for col in batch_df.columns:
+        dtype = batch_df[col].dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            fields.append(pa.field(col, pa.bool_()))
+        elif pd.api.types.is_numeric_dtype(dtype):
+            # Integers become float64 so missing values in later batches still fit
+            fields.append(pa.field(col, pa.float64()))
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            fields.append(pa.field(col, pa.timestamp('us')))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+# Function to convert a batch of rows to an Arrow table with a fixed schema
+def batch_to_arrow(batch_df, schema):
+    import pyarrow as pa
+
+    arrays = []
+    for field in schema:
+        column = batch_df[field.name]
+        if column.isna().all():
+            # A column this sheet lacks is all float NaN after reindexing; it fits any type as nulls
+            arrays.append(pa.nulls(len(column), field.type))
+        elif pa.types.is_string(field.type):
+            arrays.append(pa.array(column.map(lambda v: None if v is None or v != v else str(v)),
+                                   type=field.type, from_pandas=True))
+        else:
+            arrays.append(pa.array(column, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+# Function to widen a schema so a batch that does not fit it can be written
+# (a column whose values conflict with its type is stored as text from then on)
+def widen_schema(schema, batch_df):
+    import pyarrow as pa
+
+    fields = []
+    for field in schema:
+        if not pa.types.is_string(field.type) and not batch_df[field.name].isna().all():
+            try:
+                pa.array(batch_df[field.name], type=field.type, from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                field = pa.field(field.name, pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+# Function to copy Parquet files into one file of a wider schema, one row group at a time
+def rewrite_parquet(source_paths, output_path, schema):
+    import pyarrow.parquet as pq
+
+    with pq.ParquetWriter(output_path, schema) as writer:
+        for source_path in source_paths:
+            source = pq.ParquetFile(source_path)
+            for i in range(source.num_row_groups):
+                writer.write_table(source.read_row_group(i).cast(schema))
+
+# Function to stream every sheet in the inventory into a single output file
+def stream_excel_files(sheet_inventory, output_path, batch_size=10000, engine=None, header_report=None):
+    if not sheet_inventory:
+        print("No Excel sheets found to merge.")
+        return 0
+
+    is_parquet = output_path.endswith('.parquet')
+    if not is_parquet and not output_path.endswith('.csv'):
+        raise ValueError("stream_output must end with '.csv' or '.parquet'")
+    if is_parquet:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+    # A cheap header-only pass fixes the output columns before any data is written
+    columns = []
+    for file_sheet in sheet_inventory:
+        renames = header_renames(header_report, file_sheet)
+        for col in read_excel_header(*file_sheet, engine):
+            col = renames.get(col, col)
+            if col not in columns:
+                columns.append(col)
+    columns += ['source_file', 'source_sheet']
+
+    # Output goes to a temporary file that replaces output_path only once every sheet is written,
+    # so a failed run never leaves a truncated file behind
+    tmp_path = output_path + '.tmp'
+    segments = []
+    writer = None
+    schema = None
+    total_rows = 0
+    try:
+        for file_path, sheet_name in sheet_inventory:
+            renames = header_renames(header_report, (file_path, sheet_name))
+            for header, batch in iter_excel_rows(file_path, sheet_name, batch_size, engine):
+                batch_df = pd.DataFrame(batch, columns=[renames.get(col, col) for col in header])
+                batch_df['source_file'] = file_path
+                batch_df['source_sheet'] = sheet_name
+                batch_df = batch_df.reindex(columns=columns)
+
+                if is_parquet:
+                    if writer is None:
+                        schema = batch_schema(batch_df)
+                    try:
+                        table = batch_to_arrow(batch_df, schema)
+                    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                        # The types seen so far do not fit this batch (e.g. 'HH-0003' after numeric IDs):
+                        # continue in a new segment with the conflicting columns stored as text
+                        schema = widen_schema(schema, batch_df)
+                        table = batch_to_arrow(batch_df, schema)
+                        if writer is not None:
+                            writer.close()
+                            writer = None
+                    if writer is None:
+                        segments.append(f'{tmp_path}.{len(segments)}')
+                        writer = pq.ParquetWriter(segments[-1], schema)
+                    # Each batch becomes one row group in the output file
+                    writer.write_table(table)
+                else:
+                    append_batch_to_csv(batch_df, tmp_path, write_header=(total_rows == 0))
+
+                total_rows += len(batch_df)
+            print(f'Streamed {file_path} [{sheet_name}]')
+
+        if writer is not None:
+            writer.close()
+            writer = None
+        if len(segments) == 1:
+            os.replace(segments[0], tmp_path)
+        elif segments:
+            # Earlier segments are cast to the final, widest schema
+            rewrite_parquet(segments, tmp_path, schema)
+        if total_rows:
+            os.replace(tmp_path, output_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        for path in segments + [tmp_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    print(f'{total_rows} rows written to {output_path}')
+    return total_rows
+
+if __name__ == "__main__":
+    # Build the file and sheet inventory once; both modes reuse it
+    file_paths = build_file_inventory(directory, include_patterns, exclude_patterns, recursive)
+    sheet_inventory = build_sheet_inventory(file_paths, sheet_names, reader_engine)
+    print(f'Found {len(sheet_inventory)} sheet(s) in {len(file_paths)} workbook(s)')
+    header_report = load_header_report(header_report_file) if header_report_file else None
+
+    if stream_output:
+        stream_excel_files(sheet_inventory, stream_output, stream_batch_size, reader_engine, header_report)
+    else:
+        combined_df = merge_excel_files(sheet_inventory, max_workers, cache_dir, category_columns, reader_engine,
+                                        header_report)
+
+        # Display the combined DataFrame
+        print(combined_df)
@@ -0,0 +1,101 @@
+# pip install pandas openpyxl python-calamine pyxlsb
+# Benchmark: python _excel_readers.py sample1.xlsx sample2.xlsb ...
+
+import pandas as pd
+import os
+import sys
+import time
+import importlib.util
+import multiprocessing
+
+# Reader backends to try for each file type, fastest first
+engines_by_extension = {
+    '.xlsx': ['calamine', 'openpyxl'],
+    '.xlsm': ['calamine', 'openpyxl'],
+    '.xlsb': ['calamine', 'pyxlsb'],
+    '.xls': ['calamine', 'xlrd'],
+    '.ods': ['calamine', 'odf'],
+}
+
+# Module that has to be installed for each backend
+engine_modules = {
+    'calamine': 'python_calamine',
+    'openpyxl': 'openpyxl',
+    'pyxlsb': 'pyxlsb',
+    'xlrd': 'xlrd',
+    'odf': 'odf',
+}
+
+# Function to check whether a reader backend is installed
+def engine_available(engine):
+    return importlib.util.find_spec(engine_modules[engine]) is not None
+
+# Function to list the installed backends that can read a file, fastest first
+def engines_for_file(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    return [engine for engine in engines_by_extension.get(extension, []) if engine_available(engine)]
+
+# Function to pick the reader backend for a file
+def pick_engine(file_path, engine=None):
+    if engine is not None:
+        return engine
+    engines = engines_for_file(file_path)
+    if not engines:
+        raise ValueError(f'No installed Excel reader can open {file_path}')
+    return engines[0]
+
+# Function to read a sheet with the chosen (or fastest installed) backend
+def read_excel(file_path, sheet_name=0, engine=None, **kwargs):
+    return pd.read_excel(file_path, sheet_name=sheet_name, engine=pick_engine(file_path, engine), **kwargs)
+
+# Function to list the sheet names of a workbook
+def list_sheet_names(file_path, engine=None):
+    with pd.ExcelFile(file_path, engine=pick_engine(file_path, engine)) as excel_file:
+        return excel_file.sheet_names
+
+# Function to time one backend on one file (runs in a fresh process)
+def measure_read(file_path, engine):
+    start = time.perf_counter()
+    sheets = read_excel(file_path, sheet_name=None, engine=engine)
+    elapsed = time.perf_counter() - start
+    rows = sum(len(df) for df in sheets.values())
+
+    try:
+        import resource
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+    except ImportError:
+        peak_rss_mb = None
+
+    return rows, elapsed, peak_rss_mb
+
+# Function to benchmark every installed backend on a list of sample workbooks
+def benchmark_engines(file_paths):
+    results = []
+    # A fresh process per measurement keeps peak RSS from leaking between backends
+    context = multiprocessing.get_context('spawn')
+    for file_path in file_paths:
+        for engine in engines_for_file(file_path):
+            with context.Pool(1) as pool:
+                rows, elapsed, peak_rss_mb = pool.apply(measure_read, (file_path, engine))
+            results.append({
+                'file': file_path,
+                'engine': engine,
+                'rows': rows,
+                'seconds': round(elapsed, 3),
+                'rows_per_sec': round(rows / elapsed) if elapsed > 0 else None,
+                'peak_rss_mb': round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+            })
+            print(f'{file_path} [{engine}]: {rows} rows in {elapsed:.3f}s')
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python _excel_readers.py sample1.xlsx [sample2.xlsb ...]")
+        sys.exit(1)
+
+    results_df = benchmark_engines(sys.argv[1:])
+
+    # Display the benchmark results
+    print(results_df.to_string(index=False))
@@ -1,33 +1,673 @@
+# pip install pandas pyarrow zstandard
+
 import pandas as pd
+import numpy as np
 import os
+import io
+import re
+import json
+import time
+import hashlib
+import operator
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+# Function to create the pool used to save or load chunks in parallel
+# (threads share memory; processes also parallelize the CPU-bound CSV work)
+def make_executor(max_workers, use_processes=False):
+    if use_processes:
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+# File extension of each chunk format
+chunk_extensions = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'pickle': '.pkl',
+}
+
+# Compression codecs each chunk format accepts (None = uncompressed)
+chunk_codecs = {
+    'csv': [None, 'gzip', 'bz2', 'xz', 'zstd'],
+    'parquet': [None, 'snappy', 'zstd', 'lz4', 'gzip', 'brotli'],
+    'feather': [None, 'zstd', 'lz4'],
+    'pickle': [None, 'gzip', 'bz2', 'xz', 'zstd'],
+}
+
+# Function to check that a chunk format and compression codec go together
+def check_chunk_format(file_format, compression):
+    if file_format not in chunk_codecs:
+        raise ValueError(f'Unknown chunk format {file_format!r}, expected one of {list(chunk_codecs)}')
+    if compression not in chunk_codecs[file_format]:
+        raise ValueError(f'{file_format} chunks support compression {chunk_codecs[file_format]}, not {compression!r}')
+
+# Function to serialize a chunk to bytes in the given format
+def serialize_chunk(chunk, file_format='csv', compression=None):
+    buffer = io.BytesIO()
+    if file_format == 'csv':
+        chunk.to_csv(buffer, index=False, compression=compression)
+    elif file_format == 'parquet':
+        chunk.to_parquet(buffer, index=False, compression=compression)
+    elif file_format == 'feather':
+        # Feather only stores a default index
+        chunk.reset_index(drop=True).to_feather(buffer, compression=compression or 'uncompressed')
+    else:
+        chunk.to_pickle(buffer, compression=compression)
+    return buffer.getvalue()
+
+# Function to read a chunk back from its serialized bytes
+# (only the given columns are parsed; pickles have to be read whole first)
+def deserialize_chunk(data, file_format='csv', compression=None, columns=None):
+    buffer = io.BytesIO(data)
+    if file_format == 'csv':
+        return pd.read_csv(buffer, compression=compression, usecols=columns)
+    elif file_format == 'parquet':
+        return pd.read_parquet(buffer, columns=columns)
+    elif file_format == 'feather':
+        return pd.read_feather(buffer, columns=columns)
+    df_chunk = pd.read_pickle(buffer, compression=compression)
+    return df_chunk if columns is None else df_chunk[columns]
+
+# Function to get the manifest filename for a chunk prefix
+def manifest_filename(file_prefix):
+    return f'{file_prefix}_manifest.json'
+
+# Function to compute the checksum of a chunk file's bytes
+def checksum(data):
+    return hashlib.sha256(data).hexdigest()
+
+# Function to get the filename of the n-th chunk (numbered from 1)
+def chunk_filename(file_prefix, number, file_format='csv'):
+    return f'{file_prefix}_{number}{chunk_extensions[file_format]}'
+
+# Function to save a single chunk and return its checksum and size on disk
+def save_chunk(chunk, chunk_filename, file_format='csv', compression=None):
+    data = serialize_chunk(chunk, file_format, compression)
+    # Write to a temporary file and rename it, so a chunk file is either complete or absent
+    tmp_filename = chunk_filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, chunk_filename)
+    print(f'Saved {chunk_filename}')
+    return checksum(data), len(data)
+
+# Function to get the journal filename for a chunk prefix
+def journal_filename(file_prefix):
+    return f'{file_prefix}_journal.jsonl'
+
+# Function to fingerprint a DataFrame's contents, so a journal is only resumed for the same data
+def df_fingerprint(df):
+    return checksum(pd.util.hash_pandas_object(df).to_numpy().tobytes())
+
+# Function to open the export journal and return the chunks an earlier run already finished
+def open_journal(file_prefix, header, resume=True):
+    done = {}
+    if resume and os.path.exists(journal_filename(file_prefix)):
+        with open(journal_filename(file_prefix)) as f:
+            entries = []
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A line cut short by a crash is simply ignored
+                    pass
+        if entries and entries[0] == header:
+            for entry in entries[1:]:
+                filename = entry['file']
+                if os.path.exists(filename) and os.path.getsize(filename) == entry['bytes']:
+                    done[entry['number']] = entry
+            print(f'Resuming export: {len(done)} chunks already saved')
+            return done
+
+    # A new export (or one for different data or settings) starts a fresh journal
+    with open(journal_filename(file_prefix), 'w') as f:
+        f.write(json.dumps(header) + '\n')
+    return done
+
+# Function to record a saved chunk in the journal
+def record_chunk(file_prefix, number, file_format, start_row, end_row, result):
+    entry = {
+        'number': number,
+        'file': chunk_filename(file_prefix, number, file_format),
+        'start_row': start_row,
+        'end_row': end_row,
+        'sha256': result[0],
+        'bytes': result[1],
+    }
+    with open(journal_filename(file_prefix), 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    return entry
+
+# Function to convert a statistic to a value JSON can store
+def json_value(value):
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value if isinstance(value, (str, int, float, bool)) else str(value)
+
+# Function to compute the min, max and null count of every column of a chunk
+def chunk_stats(chunk):
+    stats = {}
+    for col in chunk.columns:
+        series = chunk[col]
+        try:
+            # Mixed-type object columns have no min/max; such chunks are never skipped
+            min_value, max_value = json_value(series.min()), json_value(series.max())
+        except TypeError:
+            min_value = max_value = None
+        stats[str(col)] = {'min': min_value, 'max': max_value, 'null_count': int(series.isna().sum())}
+    return stats
+
+# Function to estimate the in-memory bytes per row from a sample of rows
+def estimate_row_bytes(df, sample_rows=1000):
+    if len(df) == 0:
+        return 1
+    sample = df.sample(n=min(sample_rows, len(df)), random_state=0)
+    return max(1, sample.memory_usage(index=False, deep=True).sum() / len(sample))
+
+# Function to save chunks sized to roughly target_chunk_bytes on disk each
+def save_chunks_by_size(df, target_chunk_bytes, file_prefix='chunk', file_format='csv', compression=None,
+                        sample_rows=1000, done=None):
+    # Chunks finished by an interrupted run are kept, and sizing continues after them
+    ranges = []
+    results = []
+    done = done or {}
+    while len(ranges) + 1 in done:
+        entry = done[len(ranges) + 1]
+        ranges.append((entry['start_row'], entry['end_row']))
+        results.append((entry['sha256'], entry['bytes']))
+
+    # Start from the in-memory size of a sample, then correct it with the real
+    # on-disk bytes per row (after encoding and compression) of every chunk written
+    bytes_per_row = estimate_row_bytes(df, sample_rows)
+    written_bytes = sum(result[1] for result in results)
+    start_row = ranges[-1][1] if ranges else 0
+    if start_row > 0:
+        bytes_per_row = max(written_bytes / start_row, 1e-3)
+
+    while start_row < len(df) or not ranges:
+        rows = max(1, int(target_chunk_bytes / bytes_per_row))
+        end_row = min(start_row + rows, len(df))
+        number = len(ranges) + 1
+        result = save_chunk(df.iloc[start_row:end_row], chunk_filename(file_prefix, number, file_format),
+                            file_format, compression)
+        record_chunk(file_prefix, number, file_format, start_row, end_row, result)
+        ranges.append((start_row, end_row))
+        results.append(result)
+
+        written_bytes += result[1]
+        if end_row > 0:
+            bytes_per_row = max(written_bytes / end_row, 1e-3)
+        start_row = end_row
+    return ranges, results
 
 # Function to split DataFrame into smaller chunks and save them
-def save_large_df_in_chunks(df, chunk_size=10000, file_prefix='chunk'):
-    num_chunks = (len(df) // chunk_size) + 1
-    for i in range(num_chunks):
-        start_row = i * chunk_size
-        end_row = min((i + 1) * chunk_size, len(df))
-        chunk = df.iloc[start_row:end_row]
-        chunk_filename = f'{file_prefix}_{i + 1}.csv'
-        chunk.to_csv(chunk_filename, index=False)
-        print(f'Saved {chunk_filename}')
+# (with target_chunk_bytes set, chunk_size is ignored and chunks are sized in bytes instead;
+# with resume, an interrupted export of the same data continues from its journal)
+def save_large_df_in_chunks(df, chunk_size=10000, file_prefix='chunk', max_workers=1, use_processes=False,
+                            file_format='csv', compression=None, target_chunk_bytes=None, resume=True):
+    check_chunk_format(file_format, compression)
+
+    columns = [{'name': str(col), 'dtype': str(dtype)} for col, dtype in df.dtypes.items()]
+    header = {
+        'file_format': file_format,
+        'compression': compression,
+        'chunk_size': None if target_chunk_bytes is not None else chunk_size,
+        'target_chunk_bytes': target_chunk_bytes,
+        'total_rows': len(df),
+        'columns': columns,
+        'fingerprint': df_fingerprint(df),
+    }
+    done = open_journal(file_prefix, header, resume)
+
+    if target_chunk_bytes is not None:
+        # Each chunk's size depends on the ones before it, so they are written in order
+        ranges, results = save_chunks_by_size(df, target_chunk_bytes, file_prefix, file_format, compression,
+                                              done=done)
+    else:
+        # Round up, but always write at least one (possibly empty) chunk to keep the header
+        num_chunks = max(1, -(-len(df) // chunk_size))
+        ranges = [(i * chunk_size, min((i + 1) * chunk_size, len(df))) for i in range(num_chunks)]
+        results = [(done[i + 1]['sha256'], done[i + 1]['bytes']) if i + 1 in done else None
+                   for i in range(num_chunks)]
+        missing = [i for i in range(num_chunks) if results[i] is None]
+
+        if max_workers == 1:
+            for i in missing:
+                start_row, end_row = ranges[i]
+                results[i] = save_chunk(df.iloc[start_row:end_row], chunk_filename(file_prefix, i + 1, file_format),
+                                        file_format, compression)
+                record_chunk(file_prefix, i + 1, file_format, start_row, end_row, results[i])
+        else:
+            with make_executor(max_workers, use_processes) as executor:
+                futures = {
+                    executor.submit(save_chunk, df.iloc[ranges[i][0]:ranges[i][1]],
+                                    chunk_filename(file_prefix, i + 1, file_format), file_format, compression): i
+                    for i in missing
+                }
+                # Journal every chunk as soon as it is on disk, whatever order they finish in
+                for future in as_completed(futures):
+                    i = futures[future]
+                    results[i] = future.result()
+                    record_chunk(file_prefix, i + 1, file_format, ranges[i][0], ranges[i][1], results[i])
+
+    # The manifest records the order, position and checksum of every chunk
+    manifest = {
+        'file_format': file_format,
+        'compression': compression,
+        'total_rows': len(df),
+        'columns': columns,
+        'chunks': [
+            {
+                'file': chunk_filename(file_prefix, i + 1, file_format),
+                'start_row': start_row,
+                'end_row': end_row,
+                'rows': end_row - start_row,
+                'bytes': chunk_bytes,
+                'sha256': chunk_checksum,
+                'stats': chunk_stats(df.iloc[start_row:end_row]),
+            }
+            for i, ((start_row, end_row), (chunk_checksum, chunk_bytes)) in enumerate(zip(ranges, results))
+        ],
+    }
+    tmp_filename = manifest_filename(file_prefix) + '.tmp'
+    with open(tmp_filename, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_filename, manifest_filename(file_prefix))
+    print(f'Saved {manifest_filename(file_prefix)}')
+
+    # The export is complete, so the journal is no longer needed
+    os.remove(journal_filename(file_prefix))
+    return manifest
+
+# Function to load the manifest written by save_large_df_in_chunks (None if missing)
+def load_manifest(file_prefix='chunk'):
+    if not os.path.exists(manifest_filename(file_prefix)):
+        return None
+    with open(manifest_filename(file_prefix)) as f:
+        return json.load(f)
+
+# Function to restore the dtypes recorded in the manifest after a CSV round trip
+# (binary formats keep their dtypes, so nothing changes for them)
+def restore_dtypes(df, columns):
+    for column in columns:
+        name, dtype = column['name'], column['dtype']
+        if name not in df.columns or str(df[name].dtype) == dtype:
+            continue
+        try:
+            if dtype.startswith('datetime64'):
+                df[name] = pd.to_datetime(df[name])
+            else:
+                df[name] = df[name].astype(dtype)
+        except (TypeError, ValueError):
+            print(f'Could not restore {name} to {dtype}, keeping {df[name].dtype}')
+    return df
+
+# Function to load a single chunk, verifying its checksum when one is given
+def load_chunk(file, expected_checksum=None, file_format='csv', compression=None, columns=None):
+    print(f'Loading {file}...')
+    with open(file, 'rb') as f:
+        data = f.read()
+    if expected_checksum is not None and checksum(data) != expected_checksum:
+        raise ValueError(f'Checksum mismatch for {file}: the chunk is corrupt or was modified')
+    return deserialize_chunk(data, file_format, compression, columns)
+
+# Function to find chunk files without a manifest, in numeric (not lexical) order
+def find_chunk_files(file_prefix='chunk', file_format='csv'):
+    pattern = re.compile(rf'^{re.escape(file_prefix)}_(\d+){re.escape(chunk_extensions[file_format])}$')
+    numbered = [(int(m.group(1)), f) for f in os.listdir() if (m := pattern.match(f))]
+    return [f for _, f in sorted(numbered)]
+
+# Function to load a list of chunks in order
+def load_chunks(chunk_files, checksums, max_workers=1, use_processes=False, file_format='csv', compression=None,
+                columns=None):
+    if max_workers == 1:
+        return [load_chunk(file, expected, file_format, compression, columns)
+                for file, expected in zip(chunk_files, checksums)]
+
+    # executor.map returns the chunks in file order
+    num_files = len(chunk_files)
+    with make_executor(max_workers, use_processes) as executor:
+        return list(executor.map(load_chunk, chunk_files, checksums,
+                                 [file_format] * num_files, [compression] * num_files, [columns] * num_files))
+
+# Comparison operators accepted in filters, e.g. [('Municipality', '==', 'Tubay'), ('Age', '>=', 60)]
+filter_operators = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# Function to convert a stored statistic back to the column's type for comparisons
+def stat_value(value, dtype):
+    if value is not None and dtype.startswith('datetime64'):
+        return pd.Timestamp(value)
+    return value
+
+# Function to check from a chunk's statistics whether it may hold rows matching all the filters
+def chunk_may_match(chunk, filters, dtypes):
+    for col, op, value in filters:
+        stats = chunk.get('stats', {}).get(col)
+        if stats is None:
+            continue
+        if stats['null_count'] == chunk['rows']:
+            # Nothing but missing values: only '!=' can match
+            if op != '!=':
+                return False
+            continue
+
+        dtype = dtypes.get(col, '')
+        low, high = stat_value(stats['min'], dtype), stat_value(stats['max'], dtype)
+        if low is None or high is None:
+            continue
+        values = [stat_value(v, dtype) for v in value] if op == 'in' else [stat_value(value, dtype)]
+
+        try:
+            if op == '==' or op == 'in':
+                ruled_out = all(v < low or v > high for v in values)
+            elif op == '!=':
+                ruled_out = low == high == values[0] and stats['null_count'] == 0
+            elif op == '<':
+                ruled_out = low >= values[0]
+            elif op == '<=':
+                ruled_out = low > values[0]
+            elif op == '>':
+                ruled_out = high <= values[0]
+            else:
+                ruled_out = high < values[0]
+        except TypeError:
+            # Values that cannot be compared with the statistics never rule a chunk out
+            ruled_out = False
+        if ruled_out:
+            return False
+    return True
+
+# Function to keep only the rows matching all the filters
+def apply_filters(df_chunk, filters):
+    mask = pd.Series(True, index=df_chunk.index)
+    for col, op, value in filters:
+        if op == 'in':
+            mask &= df_chunk[col].isin(value)
+        else:
+            mask &= filter_operators[op](df_chunk[col], value)
+    return df_chunk[mask]
+
+# Function to list the columns to parse so the requested columns and the filters can be evaluated
+def columns_to_load(columns, filters):
+    if columns is None:
+        return None
+    load = list(columns)
+    for col, _, _ in filters or []:
+        if col not in load:
+            load.append(col)
+    return load
+
+# Function to restore dtypes, filter rows and project columns of a loaded chunk
+def prepare_chunk(df_chunk, manifest, columns=None, filters=None):
+    if manifest is not None:
+        df_chunk = restore_dtypes(df_chunk, manifest['columns'])
+    if filters:
+        df_chunk = apply_filters(df_chunk, filters)
+    if columns is not None:
+        df_chunk = df_chunk[list(columns)]
+    return df_chunk
+
+# Function to find the chunk files, checksums and format to load, from the manifest if there is one
+# (file_format and compression are only needed for chunks saved without a manifest;
+# with filters, chunks whose statistics rule out every row are left out)
+def locate_chunks(file_prefix='chunk', verify=True, file_format='csv', compression=None, filters=None):
+    manifest = load_manifest(file_prefix)
+    if manifest is not None:
+        file_format = manifest.get('file_format', 'csv')
+        compression = manifest.get('compression')
+        chunks = manifest['chunks']
+        if filters:
+            dtypes = {column['name']: column['dtype'] for column in manifest['columns']}
+            chunks = [chunk for chunk in chunks if chunk_may_match(chunk, filters, dtypes)]
+            print(f"{len(manifest['chunks']) - len(chunks)} of {len(manifest['chunks'])} chunks skipped by their statistics")
+        chunk_files = [chunk['file'] for chunk in chunks]
+        checksums = [chunk['sha256'] if verify else None for chunk in chunks]
+    else:
+        chunk_files = find_chunk_files(file_prefix, file_format)
+        checksums = [None] * len(chunk_files)
+    return manifest, chunk_files, checksums, file_format, compression
 
 # Function to merge chunks back into a single DataFrame
-def merge_chunks(file_prefix='chunk'):
-    chunk_files = sorted([f for f in os.listdir() if f.startswith(file_prefix) and f.endswith('.csv')])
-    
+# (columns limits the columns parsed; filters is a list of (column, op, value) conditions that must all hold)
+def merge_chunks(file_prefix='chunk', max_workers=1, use_processes=False, verify=True,
+                 file_format='csv', compression=None, columns=None, filters=None):
+    manifest, chunk_files, checksums, file_format, compression = locate_chunks(
+        file_prefix, verify, file_format, compression, filters)
+
     if not chunk_files:
+        if manifest is None:
+            print("No chunk files found with the given prefix.")
+            return None
+        # Every chunk was ruled out by the filters
+        return pd.DataFrame(columns=columns if columns is not None else [c['name'] for c in manifest['columns']])
+
+    dfs = load_chunks(chunk_files, checksums, max_workers, use_processes, file_format, compression,
+                      columns_to_load(columns, filters))
+
+    combined_df = pd.concat(dfs, ignore_index=True)
+    if manifest is not None and verify and not filters and len(combined_df) != manifest['total_rows']:
+        raise ValueError(f"Expected {manifest['total_rows']} rows, loaded {len(combined_df)}")
+    return prepare_chunk(combined_df, manifest, columns, filters).reset_index(drop=True)
+
+# Function to yield the chunks one at a time, in order, without keeping earlier ones in memory
+def iter_chunks(file_prefix='chunk', verify=True, file_format='csv', compression=None, columns=None, filters=None):
+    manifest, chunk_files, checksums, file_format, compression = locate_chunks(
+        file_prefix, verify, file_format, compression, filters)
+
+    total_rows = 0
+    for file, expected in zip(chunk_files, checksums):
+        df_chunk = load_chunk(file, expected, file_format, compression, columns_to_load(columns, filters))
+        total_rows += len(df_chunk)
+        yield prepare_chunk(df_chunk, manifest, columns, filters)
+
+    if manifest is not None and verify and not filters and total_rows != manifest['total_rows']:
+        raise ValueError(f"Expected {manifest['total_rows']} rows, loaded {total_rows}")
+
+# Function to append the chunks to a single .csv or .parquet file without building the combined DataFrame
+def merge_chunks_to_file(output_path, file_prefix='chunk', verify=True, file_format='csv', compression=None,
+                         columns=None, filters=None):
+    is_parquet = output_path.endswith('.parquet')
+    if not is_parquet and not output_path.endswith('.csv'):
+        raise ValueError("output_path must end with '.csv' or '.parquet'")
+
+    writer = None
+    num_chunks = 0
+    total_rows = 0
+    try:
+        for df_chunk in iter_chunks(file_prefix, verify, file_format, compression, columns, filters):
+            if is_parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                # The first chunk fixes the schema; each chunk becomes a row group
+                if writer is None:
+                    table = pa.Table.from_pandas(df_chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                else:
+                    table = pa.Table.from_pandas(df_chunk, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+            else:
+                df_chunk.to_csv(output_path, mode='w' if num_chunks == 0 else 'a',
+                                header=(num_chunks == 0), index=False)
+            num_chunks += 1
+            total_rows += len(df_chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if num_chunks == 0:
         print("No chunk files found with the given prefix.")
-        return None
+        return 0
+
+    print(f'Saved {output_path} ({total_rows} rows)')
+    return total_rows
+
+# Function to read rows [start_row, end_row) by opening only the chunks that cover them
+def read_chunk_rows(start_row, end_row, file_prefix='chunk', verify=True):
+    manifest = load_manifest(file_prefix)
+    if manifest is None:
+        raise FileNotFoundError(f'{manifest_filename(file_prefix)} not found; row ranges need a manifest')
+
+    end_row = min(end_row, manifest['total_rows'])
+    covering = [chunk for chunk in manifest['chunks']
+                if chunk['start_row'] < end_row and chunk['end_row'] > start_row]
 
     dfs = []
-    for file in chunk_files:
-        print(f'Loading {file}...')
-        df_chunk = pd.read_csv(file)
-        dfs.append(df_chunk)
+    for chunk in covering:
+        df_chunk = load_chunk(chunk['file'], chunk['sha256'] if verify else None,
+                              manifest.get('file_format', 'csv'), manifest.get('compression'))
+        # Keep only the part of the chunk inside the requested range
+        first = max(start_row - chunk['start_row'], 0)
+        last = min(end_row, chunk['end_row']) - chunk['start_row']
+        dfs.append(df_chunk.iloc[first:last])
 
-    combined_df = pd.concat(dfs, ignore_index=True)
-    return combined_df
+    if not dfs:
+        return None
+
+    rows_df = pd.concat(dfs, ignore_index=True)
+    rows_df.index = pd.RangeIndex(start_row, start_row + len(rows_df))
+    return restore_dtypes(rows_df, manifest['columns'])
+
+# Function to choose how a column is stored in the memory-mapped store:
+# fixed-width numbers, booleans and datetimes are stored as-is, everything else is dictionary-encoded
+def memmap_dtype(dtype):
+    try:
+        pandas_dtype = pd.api.types.pandas_dtype(dtype)
+    except TypeError:
+        return None
+    if isinstance(pandas_dtype, np.dtype):
+        return pandas_dtype if pandas_dtype.kind in 'biufmM' else None
+    # Nullable numeric extension types (Int64, Float32, ...) become float64 with NaN for missing values
+    if pd.api.types.is_numeric_dtype(pandas_dtype) and not pd.api.types.is_bool_dtype(pandas_dtype):
+        return np.dtype('float64')
+    return None
+
+# Function to reassemble the chunks into a per-column numpy.memmap store under store_dir
+def chunks_to_memmap(store_dir, file_prefix='chunk', verify=True):
+    manifest = load_manifest(file_prefix)
+    if manifest is None:
+        raise FileNotFoundError(f'{manifest_filename(file_prefix)} not found; the memmap store needs a manifest')
+    os.makedirs(store_dir, exist_ok=True)
+    total_rows = manifest['total_rows']
+
+    columns = []
+    arrays = {}
+    dictionaries = {}
+    for i, column in enumerate(manifest['columns']):
+        np_dtype = memmap_dtype(column['dtype'])
+        entry = {'name': column['name'], 'file': f'col_{i}.bin'}
+        if np_dtype is not None:
+            entry.update({'encoding': 'fixed', 'dtype': np_dtype.str})
+        else:
+            # Codes index into a dictionary of distinct values; -1 marks a missing value
+            np_dtype = np.dtype('int32')
+            entry.update({'encoding': 'dictionary', 'dtype': np_dtype.str, 'dictionary': f'col_{i}.json'})
+            dictionaries[column['name']] = {}
+        columns.append(entry)
+        # A memmap cannot be empty, so zero-row stores keep a single unused slot
+        arrays[column['name']] = np.memmap(os.path.join(store_dir, entry['file']), dtype=np_dtype,
+                                           mode='w+', shape=(max(total_rows, 1),))
+
+    # Fill the columns one chunk at a time
+    position = 0
+    for df_chunk in iter_chunks(file_prefix, verify):
+        end = position + len(df_chunk)
+        for entry in columns:
+            name = entry['name']
+            if entry['encoding'] == 'fixed':
+                to_numpy_args = {'na_value': np.nan} if np.dtype(entry['dtype']).kind == 'f' else {}
+                arrays[name][position:end] = df_chunk[name].to_numpy(dtype=entry['dtype'], **to_numpy_args)
+            else:
+                local_codes, uniques = pd.factorize(df_chunk[name].astype(object))
+                dictionary = dictionaries[name]
+                global_codes = np.array([dictionary.setdefault(str(value), len(dictionary)) for value in uniques]
+                                        + [-1], dtype='int32')
+                # factorize marks missing values with -1, which picks the trailing -1 above
+                arrays[name][position:end] = global_codes[local_codes]
+        position = end
+
+    for entry in columns:
+        arrays[entry['name']].flush()
+        if entry['encoding'] == 'dictionary':
+            with open(os.path.join(store_dir, entry['dictionary']), 'w') as f:
+                json.dump(list(dictionaries[entry['name']]), f)
+
+    with open(os.path.join(store_dir, 'store.json'), 'w') as f:
+        json.dump({'rows': total_rows, 'columns': columns}, f, indent=2)
+    print(f"Saved memmap store '{store_dir}' ({total_rows} rows, {len(columns)} columns)")
+
+# Function to open a memmap store without reading it; pages are loaded only when touched
+# (returns {column: memmap} plus {column: dictionary values} for dictionary-encoded columns)
+def open_memmap_store(store_dir):
+    with open(os.path.join(store_dir, 'store.json')) as f:
+        meta = json.load(f)
+
+    arrays = {}
+    dictionaries = {}
+    for entry in meta['columns']:
+        array = np.memmap(os.path.join(store_dir, entry['file']), dtype=entry['dtype'], mode='r',
+                          shape=(max(meta['rows'], 1),))
+        arrays[entry['name']] = array[:meta['rows']]
+        if entry['encoding'] == 'dictionary':
+            with open(os.path.join(store_dir, entry['dictionary'])) as f:
+                dictionaries[entry['name']] = json.load(f)
+    return arrays, dictionaries
+
+# Function to decode rows [start_row, end_row) of a memmap store into a DataFrame
+def memmap_store_to_df(arrays, dictionaries, start_row=0, end_row=None, columns=None):
+    data = {}
+    for name in columns if columns is not None else arrays:
+        values = arrays[name][start_row:end_row]
+        if name in dictionaries:
+            data[name] = pd.Categorical.from_codes(np.asarray(values), categories=dictionaries[name])
+        else:
+            data[name] = np.asarray(values)
+    num_rows = len(next(iter(data.values()))) if data else 0
+    return pd.DataFrame(data, index=pd.RangeIndex(start_row, start_row + num_rows))
+
+# Function to compare chunk formats and codecs on a representative DataFrame
+def benchmark_chunk_formats(df, options=None):
+    if options is None:
+        options = [(file_format, codec) for file_format, codecs in chunk_codecs.items() for codec in codecs]
+
+    memory_mb = df.memory_usage(deep=True).sum() / (1024 * 1024)
+    results = []
+    for file_format, compression in options:
+        try:
+            start = time.perf_counter()
+            data = serialize_chunk(df, file_format, compression)
+            write_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            deserialize_chunk(data, file_format, compression)
+            read_seconds = time.perf_counter() - start
+        except ImportError as e:
+            print(f'Skipping {file_format}/{compression}: {e}')
+            continue
+
+        results.append({
+            'format': file_format,
+            'compression': compression or 'none',
+            'size_mb': round(len(data) / (1024 * 1024), 3),
+            'write_mb_per_sec': round(memory_mb / write_seconds, 1),
+            'read_mb_per_sec': round(memory_mb / read_seconds, 1),
+        })
+    return pd.DataFrame(results)
 
 # Sample usage
 if __name__ == "__main__":
@@ -39,12 +679,26 @@ if __name__ == "__main__":
     }
     df = pd.DataFrame(data)
 
-    # Save the DataFrame in chunks
-    save_large_df_in_chunks(df)
+    # Number of threads (or processes) saving and loading chunks; 1 = one at a time
+    max_workers = 4
+
+    # Compare write/read throughput and size of the chunk formats on this DataFrame
+    print(benchmark_chunk_formats(df).to_string(index=False))
+
+    # Save the DataFrame in chunks ('csv', 'parquet', 'feather' or 'pickle');
+    # pass target_chunk_bytes (e.g. 128 * 1024 * 1024) to size chunks in bytes instead of rows
+    save_large_df_in_chunks(df, max_workers=max_workers, file_format='parquet', compression='zstd')
+
+    # Read a row range without loading every chunk
+    print(read_chunk_rows(25000, 25005))
+
+    # Load only column B of the rows with 50000 <= A < 50010; the other chunks are never opened
+    print(merge_chunks(columns=['B'], filters=[('A', '>=', 50000), ('A', '<', 50010)]))
+
+    # Write the combined data to one file, holding only a single chunk in memory
+    merge_chunks_to_file('combined_df.csv')
 
-    # Merge the chunks back into a single DataFrame
-    combined_df = merge_chunks()
-    
-    if combined_df is not None:
-        combined_df.to_csv('combined_df.csv', index=False)
-        print('Saved combined_df.csv')
+    # Reassemble into a memory-mapped column store and open it without loading it
+    chunks_to_memmap('chunk_store')
+    arrays, dictionaries = open_memmap_store('chunk_store')
+    print(arrays['B'][50000:50005].mean())
@@ -108,6 +108,32 @@ def find_best_match(name):
 df['Best Match'] = df['Names'].apply(find_best_match)
 print(df)
 
+# Score All Pairs of a Small List (or of One Block):
+# Comment: One C-level call instead of extractOne per row, but still O(n^2) time and memory - never run it on a whole 240,000-record list (see Blocked Deduplication).
+# Syntax: process.cdist(queries, choices, scorer=fuzz.ratio, score_cutoff=threshold, workers=-1)
+
+import numpy as np
+
+names = df['Names'].tolist()
+score_matrix = process.cdist(names, names, scorer=fuzz.ratio, score_cutoff=80, dtype=np.uint8, workers=-1)
+i, j = np.nonzero(np.triu(score_matrix, k=1))  # each pair once, scores under the cutoff are 0
+print(f"Similar Pairs: {[(names[a], names[b], score_matrix[a, b]) for a, b in zip(i, j)]}")
+
+# Blocked Deduplication:
+# Comment: For large lists, compare only records sharing blocking keys (barangay, birth year, phonetic surname key) and run the cdist step above within each block.
+# Syntax: from _beneficiary_dedup import add_blocking_keys, find_duplicate_pairs
+
+from _beneficiary_dedup import add_blocking_keys, find_duplicate_pairs
+
+beneficiaries = pd.DataFrame({
+    'first_name': ["Juan", "Juan", "Maria"],
+    'last_name': ["Dela Cruz", "Dela Crus", "Santos"],
+    'birthdate': ["1980-05-01", "1980-05-01", "1975-02-14"],
+    'barangay': ["Poblacion", "Poblacion", "Poblacion"],
+})
+duplicate_pairs = find_duplicate_pairs(add_blocking_keys(beneficiaries))
+print(duplicate_pairs)
+
 # Advanced Matching - Setting Up a Custom Scorer:
 # Comment: Define a more complex scoring function if needed.
 # Syntax: custom_scorer(s1, s2)